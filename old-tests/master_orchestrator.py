@@ -4,11 +4,31 @@ Chains all 4 agents together for complete Meta ad creative generation
 Flow: Background Removal → Cropping → Prompt Generation → Ad Creation
 """
 
+import asyncio
+import gc
 import os
-import sys
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
+# orjson parses/serializes the structured prompt several times faster; fall back to stdlib json
+try:
+    import orjson
+
+    def _json_loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    import json
+
+    def _json_loads(text: str) -> Any:
+        return json.loads(text)
+
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
+
 # Import all agents
 from agents import (
     BackgroundRemoverAgent,
@@ -38,6 +58,39 @@ class MasterOrchestrator:
         self.creative_generator = CreativeGeneratorAgent(self.api_key)
         print("✅ All agents initialized successfully!")
     
+    @staticmethod
+    def _strip_markdown(prompt: str) -> str:
+        """Remove a ```json markdown fence around the generated prompt if present"""
+        if prompt.startswith('```json'):
+            prompt = prompt[7:]
+        if prompt.endswith('```'):
+            prompt = prompt[:-3]
+        return prompt.strip()
+    
+    def _collect_inputs(self, product_description: Optional[str], target_audience: Optional[str],
+                        price: Optional[str]) -> Tuple[str, str, str]:
+        """
+        Prompt for any missing user inputs in one go
+        
+        Args:
+            product_description: Product description or None to ask
+            target_audience: Target audience or None to ask
+            price: Price information or None to ask
+        
+        Returns:
+            Tuple of (product_description, target_audience, price)
+        """
+        if not product_description:
+            product_description = input("📄 Enter product description: ").strip()
+        
+        if not target_audience:
+            target_audience = input("👥 Enter target audience: ").strip()
+        
+        if not price:
+            price = input("💰 Enter price (e.g., 'before 2999 Rs after 1899 Rs'): ").strip()
+        
+        return product_description, target_audience, price
+    
     def run_complete_workflow(self, image_path: str, product_description: str = None, 
                             target_audience: str = None, price: str = None) -> Dict[str, Any]:
         """
@@ -64,6 +117,11 @@ class MasterOrchestrator:
                     "workflow_step": "validation"
                 }
             
+            # Ask for everything up front so the processing steps never wait on the keyboard
+            product_description, target_audience, price = self._collect_inputs(
+                product_description, target_audience, price
+            )
+            
             workflow_results = {
                 "original_image": image_path,
                 "steps_completed": [],
@@ -87,6 +145,8 @@ class MasterOrchestrator:
                 }
             
             white_bg_path = bg_result["output_path"]
+            # Only the path is handed to the next stage
+            del bg_result
             workflow_results["steps_completed"].append("background_removal")
             workflow_results["final_outputs"]["white_background_image"] = white_bg_path
             print(f"✅ Background removed! Saved to: {white_bg_path}")
@@ -107,23 +167,15 @@ class MasterOrchestrator:
                 }
             
             cropped_path = crop_result["output_path"]
+            del crop_result
             workflow_results["steps_completed"].append("cropping")
             workflow_results["final_outputs"]["cropped_image"] = cropped_path
             print(f"✅ Image cropped! Saved to: {cropped_path}")
             
-            # STEP 3: Get User Inputs (if not provided)
+            # STEP 3: Prompt Generation Setup (inputs were collected before STEP 1)
             print("\n📝 STEP 3: Prompt Generation Setup")
             print("-" * 50)
             
-            if not product_description:
-                product_description = input("📄 Enter product description: ").strip()
-            
-            if not target_audience:
-                target_audience = input("👥 Enter target audience: ").strip()
-            
-            if not price:
-                price = input("💰 Enter price (e.g., 'before 2999 Rs after 1899 Rs'): ").strip()
-            
             user_inputs = {
                 "target_audience": target_audience,
                 "price": price
@@ -154,15 +206,12 @@ class MasterOrchestrator:
                 }
             
             generated_prompt = prompt_result["prompt"]
+            del prompt_result
             workflow_results["steps_completed"].append("prompt_generation")
             workflow_results["final_outputs"]["generated_prompt"] = generated_prompt
             
             # Clean the prompt (remove markdown if present)
-            if generated_prompt.startswith('```json'):
-                generated_prompt = generated_prompt[7:]
-            if generated_prompt.endswith('```'):
-                generated_prompt = generated_prompt[:-3]
-            generated_prompt = generated_prompt.strip()
+            generated_prompt = self._strip_markdown(generated_prompt)
             
             print("✅ Prompt generated successfully!")
             
@@ -172,8 +221,7 @@ class MasterOrchestrator:
             print("📋 Reviewing generated content...")
             
             try:
-                import json
-                prompt_json = json.loads(generated_prompt)
+                prompt_json = _json_loads(generated_prompt)
                 headline = prompt_json.get("typography_and_layout", {}).get("headline", {}).get("text", "")
                 footer = prompt_json.get("typography_and_layout", {}).get("footer", {}).get("text", "")
                 limited_offer = prompt_json.get("typography_and_layout", {}).get("limited_time_offer", {}).get("text", "")
@@ -208,13 +256,14 @@ class MasterOrchestrator:
                             if custom_offer:
                                 prompt_json["typography_and_layout"]["limited_time_offer"]["text"] = custom_offer
                             
-                            generated_prompt = json.dumps(prompt_json, indent=2)
+                            generated_prompt = _json_dumps(prompt_json)
                             print("📝 Updated prompt with custom content!")
                         break
                     else:
                         print("❌ Invalid choice. Please enter y or n.")
                         
-            except json.JSONDecodeError as e:
+            except ValueError as e:
+                # json.JSONDecodeError and orjson.JSONDecodeError are both ValueError subclasses
                 print(f"⚠️ Could not parse JSON prompt for review: {str(e)}")
                 print("📝 Proceeding with raw prompt output...")
                 print("💡 The prompt will still be used for ad generation, but custom text editing is not available.")
@@ -239,6 +288,7 @@ class MasterOrchestrator:
                 }
             
             final_creative_path = creative_result["output_path"]
+            del creative_result
             workflow_results["steps_completed"].append("ad_creation")
             workflow_results["final_outputs"]["final_meta_ad"] = final_creative_path
             
@@ -269,3 +319,158 @@ class MasterOrchestrator:
                 "workflow_step": "unknown",
                 "workflow_results": workflow_results if 'workflow_results' in locals() else {}
             }
+        finally:
+            # One collection per workflow (not per stage) to drop any image buffers left in cycles
+            gc.collect()
+    
+    def run_batch_workflow(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run the 4-agent workflow for many images without human review
+        
+        Stages are connected by queues, so while one image is in prompt generation the
+        next one can already be cropped and another one have its background removed.
+        
+        Args:
+            jobs: List of dicts with image_path, product_description, target_audience and price
+        
+        Returns:
+            List of per-job results (same shape as run_complete_workflow), in job order
+        """
+        return asyncio.run(self._run_batch_pipeline(jobs))
+    
+    async def _run_batch_pipeline(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pipeline behind run_batch_workflow: one queue and one worker per stage"""
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        queues = [asyncio.Queue() for _ in range(4)]
+        
+        # The agent SDKs are synchronous, so every call runs in an executor.
+        # Cropping is pure CPU work and gets its own pool sized to the machine.
+        crop_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        
+        def fail(index: int, state: Dict[str, Any], step: str, error: str) -> None:
+            results[index] = {
+                "success": False,
+                "error": error,
+                "workflow_step": step,
+                "workflow_results": state["workflow_results"]
+            }
+        
+        async def remove_background(index: int, state: Dict[str, Any]) -> bool:
+            bg_result = await loop.run_in_executor(
+                None, self.background_remover.remove_background, state["image_path"]
+            )
+            if not bg_result["success"]:
+                fail(index, state, "background_removal", f"Background removal failed: {bg_result['error']}")
+                return False
+            state["white_bg_path"] = bg_result["output_path"]
+            state["workflow_results"]["steps_completed"].append("background_removal")
+            state["workflow_results"]["final_outputs"]["white_background_image"] = state["white_bg_path"]
+            return True
+        
+        async def crop(index: int, state: Dict[str, Any]) -> bool:
+            crop_result = await loop.run_in_executor(
+                crop_executor, self.image_cropper.crop_to_square, state["white_bg_path"]
+            )
+            if not crop_result["success"]:
+                fail(index, state, "cropping", f"Cropping failed: {crop_result['error']}")
+                return False
+            state["cropped_path"] = crop_result["output_path"]
+            state["workflow_results"]["steps_completed"].append("cropping")
+            state["workflow_results"]["final_outputs"]["cropped_image"] = state["cropped_path"]
+            return True
+        
+        async def generate_prompt(index: int, state: Dict[str, Any]) -> bool:
+            prompt_result = await loop.run_in_executor(None, lambda: self.prompt_generator.generate_prompt(
+                state["cropped_path"],
+                description=state["product_description"],
+                user_inputs={
+                    "target_audience": state["target_audience"],
+                    "price": state["price"]
+                }
+            ))
+            if not prompt_result["success"]:
+                fail(index, state, "prompt_generation", f"Prompt generation failed: {prompt_result['error']}")
+                return False
+            state["workflow_results"]["steps_completed"].append("prompt_generation")
+            state["workflow_results"]["final_outputs"]["generated_prompt"] = prompt_result["prompt"]
+            state["generated_prompt"] = self._strip_markdown(prompt_result["prompt"])
+            return True
+        
+        async def generate_creative(index: int, state: Dict[str, Any]) -> bool:
+            creative_result = await loop.run_in_executor(
+                None,
+                self.creative_generator.generate_creative,
+                state["cropped_path"],
+                state["generated_prompt"],
+                state["product_description"]
+            )
+            if not creative_result["success"]:
+                fail(index, state, "ad_creation", f"Ad creative generation failed: {creative_result['error']}")
+                return False
+            state["workflow_results"]["steps_completed"].append("ad_creation")
+            state["workflow_results"]["final_outputs"]["final_meta_ad"] = creative_result["output_path"]
+            state["workflow_results"]["success"] = True
+            results[index] = {
+                "success": True,
+                "message": "Complete workflow executed successfully!",
+                "workflow_results": state["workflow_results"],
+                "final_outputs": state["workflow_results"]["final_outputs"]
+            }
+            return True
+        
+        async def worker(stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]) -> None:
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    # Propagate the shutdown signal down the pipeline
+                    if outbox is not None:
+                        await outbox.put(None)
+                    return
+                index, state = item
+                try:
+                    passed = await stage(index, state)
+                except Exception as e:
+                    fail(index, state, stage.__name__, f"Workflow failed: {str(e)}")
+                    passed = False
+                if passed and outbox is not None:
+                    await outbox.put(item)
+        
+        stages = [remove_background, crop, generate_prompt, generate_creative]
+        workers = [
+            asyncio.create_task(worker(stage, queues[i], queues[i + 1] if i + 1 < len(queues) else None))
+            for i, stage in enumerate(stages)
+        ]
+        
+        print(f"🚀 Running batch workflow for {len(jobs)} images...")
+        for index, job in enumerate(jobs):
+            state = {
+                "image_path": job["image_path"],
+                "product_description": job.get("product_description", ""),
+                "target_audience": job.get("target_audience", ""),
+                "price": job.get("price", ""),
+                "workflow_results": {
+                    "original_image": job["image_path"],
+                    "steps_completed": [],
+                    "final_outputs": {},
+                    "success": False
+                }
+            }
+            if not os.path.exists(job["image_path"]):
+                results[index] = {
+                    "success": False,
+                    "error": f"Image not found: {job['image_path']}",
+                    "workflow_step": "validation"
+                }
+                continue
+            await queues[0].put((index, state))
+        await queues[0].put(None)
+        
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            crop_executor.shutdown(wait=False)
+        
+        successful = sum(1 for result in results if result and result["success"])
+        print(f"✅ Batch workflow finished: {successful}/{len(jobs)} creatives generated")
+        return results
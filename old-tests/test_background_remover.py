@@ -3,17 +3,36 @@ Test script for Background Remover Agent
 Tests background removal using Nano Banana model
 """
 
+import argparse
+import asyncio
 import os
 import sys
 from dotenv import load_dotenv
 
-# Add src to path for imports
+# Add src (agents) and the project root (shared test helpers) to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from agents import BackgroundRemoverAgent
+from tests._agent_cache import get_agent
 
 load_dotenv()
 
+# Command-line options; the defaults apply when the tests are collected by pytest
+_args = argparse.Namespace(image=None, images=None, non_interactive=False)
+
+def parse_args(argv=None):
+    """Parse command-line flags so the tests can run without prompts"""
+    parser = argparse.ArgumentParser(description="Background Remover Agent test")
+    parser.add_argument("--image", help="Image for the single image test")
+    parser.add_argument("--images", nargs="+", help="Images for the multiple image test")
+    parser.add_argument("--non-interactive", action="store_true", help="Never prompt for missing values")
+    return parser.parse_args(argv)
+
+def _can_prompt():
+    """Only fall back to input() when someone is at the keyboard"""
+    return not _args.non_interactive and sys.stdin.isatty()
+
 def test_single_image():
     """Test removing background from a single image"""
     print("🧪 Testing Single Image Background Removal")
@@ -21,11 +40,15 @@ def test_single_image():
     
     try:
         # Initialize agent
-        remover = BackgroundRemoverAgent()
+        remover = get_agent(BackgroundRemoverAgent)
         print("✅ Background Remover Agent initialized!")
         
         # Get image path
-        image_path = input("🖼️ Enter image path: ").strip()
+        image_path = _args.image or (input("🖼️ Enter image path: ").strip() if _can_prompt() else "")
+        
+        if not image_path:
+            print("❌ No image provided (use --image)")
+            return
         
         if not os.path.exists(image_path):
             print(f"❌ Image not found: {image_path}")
@@ -57,17 +80,20 @@ def test_multiple_images():
     
     try:
         # Initialize agent
-        remover = BackgroundRemoverAgent()
+        remover = get_agent(BackgroundRemoverAgent)
         print("✅ Background Remover Agent initialized!")
         
         # Get image paths
-        print("📁 Enter image paths (press Enter with empty line to finish):")
         image_paths = []
+        if _args.images:
+            candidates = _args.images
+        elif _can_prompt():
+            print("📁 Enter image paths (press Enter with empty line to finish):")
+            candidates = iter(lambda: input("🖼️ Image path: ").strip(), "")
+        else:
+            candidates = []
         
-        while True:
-            path = input("🖼️ Image path: ").strip()
-            if not path:
-                break
+        for path in candidates:
             if os.path.exists(path):
                 image_paths.append(path)
                 print(f"✅ Added: {path}")
@@ -80,8 +106,8 @@ def test_multiple_images():
         
         print(f"\n📊 Processing {len(image_paths)} images...")
         
-        # Remove backgrounds from all images
-        result = remover.remove_background_batch(image_paths)
+        # Remove backgrounds from all images concurrently
+        result = asyncio.run(remover.remove_background_batch_async(image_paths))
         
         print(f"\n📈 Results Summary:")
         print(f"   Total images: {result['total_images']}")
@@ -91,8 +117,9 @@ def test_multiple_images():
         
         # Show individual results
         print(f"\n📋 Individual Results:")
-        for i, item in enumerate(result['results'], 1):
-            print(f"\n   {i}. {os.path.basename(item['image_path'])}")
+        names = [os.path.basename(item['image_path']) for item in result['results']]
+        for i, (name, item) in enumerate(zip(names, result['results']), 1):
+            print(f"\n   {i}. {name}")
             if item['result']['success'] and item['result'].get('image_generated'):
                 print(f"      ✅ Success: {item['result']['output_path']}")
             else:
@@ -101,6 +128,12 @@ def test_multiple_images():
     except Exception as e:
         print(f"❌ Error: {str(e)}")
 
+# Menu choice -> test function
+MENU = {
+    "1": test_single_image,
+    "2": test_multiple_images,
+}
+
 def main():
     """Main test function"""
     print("🎯 Background Remover Agent Test")
@@ -109,6 +142,21 @@ def main():
     print("✨ Perfect for preparing product images for Meta ad creatives")
     print("="*60)
     
+    global _args
+    _args = parse_args()
+    
+    # Flags pick the tests directly, no menu needed
+    if _args.image or _args.images:
+        if _args.image:
+            test_single_image()
+        if _args.images:
+            test_multiple_images()
+        return
+    
+    if not _can_prompt():
+        print("❌ No images provided (use --image or --images)")
+        sys.exit(2)
+    
     while True:
         print("\n🔧 Choose test type:")
         print("   [1] Test single image")
@@ -117,10 +165,9 @@ def main():
         
         choice = input("\nEnter your choice (1-3): ").strip()
         
-        if choice == "1":
-            test_single_image()
-        elif choice == "2":
-            test_multiple_images()
+        test = MENU.get(choice)
+        if test:
+            test()
         elif choice == "3":
             print("👋 Goodbye!")
             break
@@ -3,6 +3,7 @@ Test script for BOTH agents working together
 Tests the complete workflow: Agent 1 generates prompt, Agent 2 uses it to create Meta creative
 """
 
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
@@ -14,6 +15,27 @@ from agents import PromptGeneratorAgent, CreativeGeneratorAgent
 
 load_dotenv()
 
+# Command-line options; the defaults apply when the test is collected by pytest
+_args = argparse.Namespace(image=None, description=None, audience=None, price=None, non_interactive=False)
+
+def parse_args(argv=None):
+    """Parse command-line flags so the test can run without prompts"""
+    parser = argparse.ArgumentParser(description="Prompt + creative generator workflow test")
+    parser.add_argument("--image", help="Product image path")
+    parser.add_argument("--description", help="Product description")
+    parser.add_argument("--audience", help="Target audience (optional)")
+    parser.add_argument("--price", help="Price (optional)")
+    parser.add_argument("--non-interactive", action="store_true", help="Never prompt for missing values")
+    return parser.parse_args(argv)
+
+def _ask(value, prompt):
+    """Return the flag value, or ask for it when someone is at the keyboard"""
+    if value is not None:
+        return value
+    if _args.non_interactive or not sys.stdin.isatty():
+        return ""
+    return input(prompt).strip()
+
 def test_both_agents():
     """Test both agents working together in the complete workflow"""
     print("🧪 Testing BOTH Agents - Complete Workflow")
@@ -35,13 +57,17 @@ def test_both_agents():
         
         # Get user inputs
         print("\n📋 Please provide the following information:")
-        image_path = input("🖼️ Product image path: ").strip()
-        description = input("📄 Product description: ").strip()
+        image_path = _ask(_args.image, "🖼️ Product image path: ")
+        description = _ask(_args.description, "📄 Product description: ")
+        
+        if not image_path or not description:
+            print("❌ Image and description are required (use --image and --description)")
+            return
         
         # Optional user inputs
         print("\n🔧 Optional customizations (press Enter to skip):")
-        target_audience = input("👥 Target audience: ").strip() or None
-        price = input("💰 Price: ").strip() or None
+        target_audience = _ask(_args.audience, "👥 Target audience: ") or None
+        price = _ask(_args.price, "💰 Price: ") or None
         
         user_inputs = {}
         if target_audience:
@@ -59,9 +85,20 @@ def test_both_agents():
         print("\n" + "="*60)
         print("🤖 STEP 1: Testing Agent 1 (Prompt Generator)")
         print("="*60)
-        print("⏳ Generating structured prompt...")
+        print("⏳ Generating structured prompt (streaming)...")
+        print("-" * 40)
+        
+        def show_chunk(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
         
-        agent1_result = agent1.generate_prompt(image_path, description, user_inputs)
+        agent1_result = agent1.generate_prompt_stream(
+            image_path,
+            on_chunk=show_chunk,
+            description=description,
+            user_inputs=user_inputs
+        )
+        print("\n" + "-" * 40)
         
         if not agent1_result["success"]:
             print(f"❌ Agent 1 failed: {agent1_result['error']}")
@@ -80,12 +117,6 @@ def test_both_agents():
         if structured.get("limited_time_offer", {}).get("text"):
             print(f"   ⏰ Limited Offer: {structured['limited_time_offer']['text']}")
         
-        # Show full prompt
-        print("\n📄 Full Generated Prompt:")
-        print("-" * 40)
-        print(agent1_result["prompt"])
-        print("-" * 40)
-        
         # STEP 2: Test Agent 2 - Generate creative using Agent 1's prompt
         print("\n" + "="*60)
         print("🎨 STEP 2: Testing Agent 2 (Creative Generator)")
@@ -133,4 +164,5 @@ def test_both_agents():
         print("Please check your setup and try again.")
 
 if __name__ == "__main__":
+    _args = parse_args()
     test_both_agents()
@@ -3,6 +3,7 @@ Test script for Complete Meta Ad Creative Workflow
 Tests all 4 agents chained together
 """
 
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
@@ -14,6 +15,41 @@ from master_orchestrator import MasterOrchestrator
 
 load_dotenv()
 
+def parse_args(argv=None):
+    """Parse command-line flags; --batch runs several images through the pipelined workflow"""
+    parser = argparse.ArgumentParser(description="Complete 4-agent workflow test")
+    parser.add_argument("--batch", nargs="+", metavar="IMAGE",
+                        help="Run these images through run_batch_workflow without prompts")
+    parser.add_argument("--description", default="", help="Product description for every batch image")
+    parser.add_argument("--audience", default="", help="Target audience for every batch image")
+    parser.add_argument("--price", default="", help="Price for every batch image")
+    return parser.parse_args(argv)
+
+def run_batch(image_paths, product_description, target_audience, price):
+    """Run several images through the orchestrator's overlapped batch pipeline"""
+    print("🎯 Batch Meta Ad Creative Workflow")
+    print("="*70)
+    
+    orchestrator = MasterOrchestrator()
+    jobs = [
+        {
+            "image_path": image_path,
+            "product_description": product_description,
+            "target_audience": target_audience,
+            "price": price
+        }
+        for image_path in image_paths
+    ]
+    results = orchestrator.run_batch_workflow(jobs)
+    
+    print("\n📊 Batch Summary:")
+    for job, result in zip(jobs, results):
+        if result["success"]:
+            print(f"   ✅ {job['image_path']}: {result['final_outputs'].get('final_meta_ad')}")
+        else:
+            print(f"   ❌ {job['image_path']}: {result['error']} (step: {result.get('workflow_step', 'Unknown')})")
+    return all(result["success"] for result in results)
+
 def test_complete_workflow():
     """Test the complete 4-agent workflow"""
     print("🎯 Complete Meta Ad Creative Workflow Test")
@@ -88,4 +124,8 @@ def test_complete_workflow():
         print(f"❌ Error: {str(e)}")
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        success = run_batch(args.batch, args.description, args.audience, args.price)
+        sys.exit(0 if success else 1)
     test_complete_workflow()
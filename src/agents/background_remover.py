@@ -4,37 +4,113 @@ Uses Google's Nano Banana model to remove backgrounds and replace with white
 """
 
 from typing import Dict, Any, Optional
+import httpx
 from google import genai
 from google.genai import types
 from PIL import Image
 from io import BytesIO
+import asyncio
+import hashlib
 import os
+import shutil
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Most results kept in an output directory's .cache folder; the least recently used are evicted
+CACHE_MAX_ENTRIES = 64
+
 class BackgroundRemoverAgent:
     """
     Agent for removing backgrounds from product images using Nano Banana
     Replaces backgrounds with white for clean product images
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the background remover agent"""
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.Client] = None):
+        """Initialize the background remover agent (http_client lets agents share one connection pool)"""
         # Use specific key for background removal, fall back to general key
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY_BACKGROUND") or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("Google API key is required. Set GOOGLE_API_KEY_BACKGROUND or GOOGLE_API_KEY environment variable.")
         
-        self.client = genai.Client(api_key=self.api_key)
+        http_options = types.HttpOptions(httpx_client=http_client) if http_client else None
+        self.client = genai.Client(api_key=self.api_key, http_options=http_options)
     
-    def remove_background(self, image_path: str, output_path: Optional[str] = None) -> Dict[str, Any]:
+    def _cache_path(self, image_path: str, output_path: str) -> str:
+        """
+        Build the cache path for an input image, keyed by a hash of its contents
+        
+        Args:
+            image_path: Path to the input image
+            output_path: Output path (its directory and extension are reused for the cache entry)
+        
+        Returns:
+            Path of the cached white-background result
+        """
+        # BLAKE2b is plenty here - we only need a fast content fingerprint, not cryptographic guarantees
+        with open(image_path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        
+        cache_dir = os.path.join(os.path.dirname(output_path), ".cache")
+        extension = os.path.splitext(output_path)[1]
+        return os.path.join(cache_dir, f"{digest}{extension}")
+    
+    @staticmethod
+    def _prune_cache(cache_dir: str, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        """Delete the least recently used cache entries beyond max_entries"""
+        entries = []
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    continue  # Another call is still writing this entry
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass  # Evicted concurrently - nothing to do
+        entries.sort(reverse=True)
+        for _, path in entries[max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Removed concurrently - nothing to do
+    
+    def _store_in_cache(self, output_path: str, cache_path: str) -> None:
+        """
+        Copy a result into the cache and evict old entries
+        
+        The entry is written to a temporary file and moved into place, so a concurrent
+        cache hit never reads a half-written image. Cache failures are only reported -
+        the result itself was already saved to output_path.
+        """
+        cache_dir = os.path.dirname(cache_path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.copyfile(output_path, tmp_path)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                os.remove(tmp_path)
+                raise
+            self._prune_cache(cache_dir)
+        except OSError as e:
+            print(f"⚠️ Could not cache background removal result: {e}")
+    
+    def remove_background(self, image_path: str, output_path: Optional[str] = None,
+                          use_cache: bool = True) -> Dict[str, Any]:
         """
         Remove background from product image and replace with white
         
+        Results are cached in a .cache folder next to the output, keyed by the input
+        image's contents, and at most CACHE_MAX_ENTRIES are kept per folder.
+        
         Args:
             image_path: Path to the input image
             output_path: Optional output path (if None, saves to data/output/white_backgrounds/)
+            use_cache: Reuse a cached result for the same image (False always calls the
+                model and replaces the cached entry, e.g. to retry a bad result)
         
         Returns:
             Dictionary containing the result
@@ -54,8 +130,31 @@ class BackgroundRemoverAgent:
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir, exist_ok=True)
             
-            # Load the image
-            image = Image.open(image_path)
+            # Reuse a previous result for the exact same input image
+            cache_path = self._cache_path(image_path, output_path)
+            cache_hit = False
+            if use_cache and os.path.exists(cache_path):
+                try:
+                    shutil.copyfile(cache_path, output_path)
+                    os.utime(cache_path)  # Mark as recently used for the eviction order
+                    cache_hit = True
+                except OSError:
+                    pass  # Evicted concurrently - call the model instead
+            if cache_hit:
+                print(f"♻️ Reusing cached background removal: {output_path}")
+                return {
+                    "success": True,
+                    "message": "Background removed and replaced with white (cached)",
+                    "output_path": output_path,
+                    "original_path": image_path,
+                    "result_text": "",
+                    "image_generated": True,
+                    "metadata": {
+                        "model_used": "gemini-2.5-flash-image",
+                        "operation": "background_removal",
+                        "cached": True
+                    }
+                }
             
             # Create the prompt for background removal
             prompt = """
@@ -75,11 +174,12 @@ class BackgroundRemoverAgent:
             print("🔄 Processing image with Nano Banana...")
             print("🎯 Removing background and replacing with white...")
             
-            # Call Nano Banana model
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[prompt, image],
-            )
+            # Load the image only for the duration of the model call
+            with Image.open(image_path) as image:
+                response = self.client.models.generate_content(
+                    model="gemini-2.5-flash-image",
+                    contents=[prompt, image],
+                )
             
             result_text = ""
             processed_image = None
@@ -89,9 +189,9 @@ class BackgroundRemoverAgent:
                 if part.text is not None:
                     result_text += part.text
                 elif part.inline_data is not None:
-                    # Save the generated image
-                    processed_image = Image.open(BytesIO(part.inline_data.data))
-                    processed_image.save(output_path, quality=95)
+                    # Save the generated image and release its pixel buffer right away
+                    with Image.open(BytesIO(part.inline_data.data)) as processed_image:
+                        processed_image.save(output_path, quality=95)
                     print(f"✅ Background removed successfully!")
                     print(f"💾 Saved to: {output_path}")
             
@@ -111,6 +211,9 @@ class BackgroundRemoverAgent:
                     }
                 }
             
+            # Store the result so re-runs of the same image skip the model call
+            self._store_in_cache(output_path, cache_path)
+            
             return {
                 "success": True,
                 "message": "Background removed and replaced with white",
@@ -196,3 +299,75 @@ class BackgroundRemoverAgent:
             "results": results,
             "output_directory": output_dir
         }
+    
+    async def remove_background_batch_async(self, image_paths: list, output_dir: str = "data/output/white_backgrounds",
+                                            max_concurrency: int = 8) -> Dict[str, Any]:
+        """
+        Remove backgrounds from multiple images concurrently
+        
+        Each image is an independent network-bound model call, so up to
+        max_concurrency requests are kept in flight instead of one at a time.
+        
+        Args:
+            image_paths: List of image paths
+            output_dir: Directory to save processed images
+            max_concurrency: Maximum number of simultaneous model calls (keeps us under the quota)
+        
+        Returns:
+            Dictionary containing results for all images, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # Create output directory
+        os.makedirs(output_dir, exist_ok=True)
+        
+        print(f"🔄 Processing {len(image_paths)} images (up to {max_concurrency} at a time)...")
+        
+        async def process(index: int, image_path: str) -> Dict[str, Any]:
+            base_name = os.path.splitext(os.path.basename(image_path))[0]
+            extension = os.path.splitext(image_path)[1]
+            output_path = os.path.join(output_dir, f"{base_name}_white_bg{extension}")
+            
+            async with semaphore:
+                try:
+                    result = await asyncio.to_thread(self.remove_background, image_path, output_path)
+                except Exception as e:
+                    # One failure (e.g. quota) must not abort the rest of the batch
+                    print(f"❌ Error processing {os.path.basename(image_path)}: {str(e)}")
+                    return {
+                        "id": index,
+                        "image_path": image_path,
+                        "status": "error",
+                        "error": str(e),
+                        "result": {
+                            "success": False,
+                            "error": str(e),
+                            "image_generated": False
+                        }
+                    }
+            
+            if result["success"] and result.get("image_generated"):
+                print(f"✅ Success: {os.path.basename(output_path)}")
+                status = "success"
+            else:
+                print(f"❌ Failed: {result.get('error', 'Unknown error')}")
+                status = "failed"
+            
+            return {
+                "id": index,
+                "image_path": image_path,
+                "status": status,
+                "result": result
+            }
+        
+        results = await asyncio.gather(*(process(i, path) for i, path in enumerate(image_paths)))
+        successful_removals = sum(1 for item in results if item["status"] == "success")
+        
+        return {
+            "success": successful_removals > 0,
+            "total_images": len(image_paths),
+            "successful_removals": successful_removals,
+            "failed_removals": len(image_paths) - successful_removals,
+            "results": results,
+            "output_directory": output_dir
+        }
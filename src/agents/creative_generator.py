@@ -6,6 +6,7 @@ Takes prompt from Agent 1 and feeds it directly to Nano Banana
 import json
 import re
 from typing import Dict, Any, Optional, List
+import httpx
 from google import genai
 from google.genai import types
 from PIL import Image
@@ -38,14 +39,16 @@ class CreativeGeneratorAgent:
     Feeds prompt directly to Nano Banana
     """
     
-    def __init__(self, api_key: Optional[str] = None, custom_font_names: Optional[List[str]] = None):
-        """Initialize the creative generator agent"""
+    def __init__(self, api_key: Optional[str] = None, custom_font_names: Optional[List[str]] = None,
+                 http_client: Optional[httpx.Client] = None):
+        """Initialize the creative generator agent (http_client lets agents share one connection pool)"""
         # Use specific key for creative generation, fall back to general key
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY_CREATIVE") or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("Google API key is required. Set GOOGLE_API_KEY_CREATIVE or GOOGLE_API_KEY environment variable.")
         
-        self.client = genai.Client(api_key=self.api_key)
+        http_options = types.HttpOptions(httpx_client=http_client) if http_client else None
+        self.client = genai.Client(api_key=self.api_key, http_options=http_options)
     
         # Combine common font names with any custom ones provided
         self.font_names_to_strip = COMMON_FONT_NAMES.copy()
@@ -349,22 +352,27 @@ CRITICAL INSTRUCTIONS FOR IMAGE GENERATION:
             # Try Gemini 3 Pro first, fallback to Gemini 2.5 Flash
             model_name = "models/gemini-3-pro-image-preview"
             try:
-                # Try Gemini 3 Pro first
-                response = self.client.models.generate_content(
-                    model="models/gemini-3-pro-image-preview",
-                    contents=contents,
-                )
-            except Exception as pro_error:
-                # Fallback to Gemini 2.5 Flash
                 try:
+                    # Try Gemini 3 Pro first
                     response = self.client.models.generate_content(
-                        model="gemini-2.5-flash-image",
+                        model="models/gemini-3-pro-image-preview",
                         contents=contents,
                     )
-                    model_name = "gemini-2.5-flash-image"
-                except Exception as fallback_error:
-                    # If both fail, raise the original error
-                    raise pro_error
+                except Exception as pro_error:
+                    # Fallback to Gemini 2.5 Flash
+                    try:
+                        response = self.client.models.generate_content(
+                            model="gemini-2.5-flash-image",
+                            contents=contents,
+                        )
+                        model_name = "gemini-2.5-flash-image"
+                    except Exception as fallback_error:
+                        # If both fail, raise the original error
+                        raise pro_error
+            finally:
+                # The input images are only needed for the request itself
+                for content_image in contents[1:]:
+                    content_image.close()
             
             # Process the response
             result_text = ""
@@ -374,8 +382,8 @@ CRITICAL INSTRUCTIONS FOR IMAGE GENERATION:
                 if part.text is not None:
                     result_text += part.text
                 elif part.inline_data is not None:
-                    generated_image = Image.open(BytesIO(part.inline_data.data))
-                    generated_image.save(output_path)
+                    with Image.open(BytesIO(part.inline_data.data)) as generated_image:
+                        generated_image.save(output_path)
             
             # Save text result if no image was generated
             if generated_image is None:
@@ -8,14 +8,22 @@ import base64
 import json
 import re
 import random
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
+import orjson
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# A ```json ... ``` (or bare ```) fence around the outermost JSON object
+_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+# Trailing comma before a closing brace/bracket - the most common way model JSON is invalid.
+# String literals are matched first (group 1) so commas inside ad copy are left alone.
+_TRAILING_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|,(\s*[}\]])')
+
 class PromptGeneratorAgent:
     """
     Prompt Generator Agent: Generates structured prompts for Google Nano Banana model
@@ -577,10 +585,12 @@ TEXT GENERATION REQUIREMENTS:
         
         return guidelines.get(brand_positioning, guidelines["MASS CONSUMER"])
     
-    def encode_image(self, image_path: str) -> str:
-        """Encode image to base64 for API"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    def encode_image(self, image_path: str, image_bytes: Optional[bytes] = None) -> str:
+        """Encode image to base64 for API (image_bytes, if given, are used instead of reading the file)"""
+        if image_bytes is None:
+            with open(image_path, "rb") as image_file:
+                image_bytes = image_file.read()
+        return base64.b64encode(image_bytes).decode('utf-8')
     
     def generate_prompt(self, image_path: str, 
                        product_persona: Optional[Dict[str, Any]] = None,
@@ -588,7 +598,8 @@ TEXT GENERATION REQUIREMENTS:
                        user_inputs: Optional[Dict[str, Any]] = None,
                        include_price: bool = True,
                        logo_path: Optional[str] = None,
-                       promotion_text: Optional[str] = None) -> Dict[str, Any]:
+                       promotion_text: Optional[str] = None,
+                       image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Generate structured prompt based on product persona
         
@@ -600,44 +611,222 @@ TEXT GENERATION REQUIREMENTS:
             include_price: Whether to include pricing information
             logo_path: Path to company logo (optional)
             promotion_text: Promotion text (e.g., "30% winter sale") (optional)
+            image_bytes: Already loaded contents of image_path (optional), so callers sending
+                the same image several times don't re-read it
+        
+        Returns:
+            Dictionary containing the generated prompt and metadata
+        """
+        return self._generate_prompt(image_path, product_persona, description, user_inputs,
+                                     include_price, logo_path, promotion_text,
+                                     image_bytes=image_bytes)
+    
+    def generate_prompt_stream(self, image_path: str,
+                               on_chunk: Callable[[str], None],
+                               product_persona: Optional[Dict[str, Any]] = None,
+                               description: Optional[str] = None,
+                               user_inputs: Optional[Dict[str, Any]] = None,
+                               include_price: bool = True,
+                               logo_path: Optional[str] = None,
+                               promotion_text: Optional[str] = None,
+                               image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Generate structured prompt, streaming the text as the model produces it
+        
+        Same as generate_prompt, but on_chunk is called with each piece of text as soon as
+        it arrives. A response cut off by the model (finish_reason other than STOP, e.g.
+        MAX_TOKENS) is reported as a failure instead of returning truncated JSON.
+        
+        Args:
+            image_path: Path to the product image
+            on_chunk: Callback receiving each streamed text chunk
+            product_persona: Structured product persona from Agent 1 (includes auto-detected font styles)
+            description: Product description (legacy, used if product_persona not provided)
+            user_inputs: Optional user inputs (legacy, used if product_persona not provided)
+            include_price: Whether to include pricing information
+            logo_path: Path to company logo (optional)
+            promotion_text: Promotion text (e.g., "30% winter sale") (optional)
+            image_bytes: Already loaded contents of image_path (optional), so callers sending
+                the same image several times don't re-read it
+        
+        Returns:
+            Dictionary containing the generated prompt and metadata
+        """
+        return self._generate_prompt(image_path, product_persona, description, user_inputs,
+                                     include_price, logo_path, promotion_text, on_chunk=on_chunk,
+                                     image_bytes=image_bytes)
+    
+    def generate_prompt_batch(self, items: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Generate prompts for several products at once
+        
+        The requests are independent, so up to max_concurrency of them are in flight
+        together instead of paying one full round trip after another.
+        
+        Args:
+            items: List of generate_prompt keyword arguments (image_path, description, user_inputs, logo_path, ...)
+            max_concurrency: Maximum number of simultaneous requests
+        
+        Returns:
+            List of generate_prompt result dictionaries, in the same order as items.
+            A failed item gets an error dictionary and does not affect the others.
+        """
+        if not items:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+            futures = [executor.submit(self.generate_prompt, **item) for item in items]
+        
+        results = []
+        for item, future in zip(items, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # e.g. invalid keyword arguments for this item
+                results.append({
+                    "success": False,
+                    "error": str(e),
+                    "prompt": None,
+                    "prompt_json": None,
+                    "structured_prompt": None,
+                    "metadata": {
+                        "image_path": item.get("image_path")
+                    }
+                })
+        return results
+    
+    async def generate_prompt_async(self, image_path: str,
+                                    product_persona: Optional[Dict[str, Any]] = None,
+                                    description: Optional[str] = None,
+                                    user_inputs: Optional[Dict[str, Any]] = None,
+                                    include_price: bool = True,
+                                    logo_path: Optional[str] = None,
+                                    promotion_text: Optional[str] = None,
+                                    image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Generate structured prompt without blocking the event loop
+        
+        Same as generate_prompt, but the model call goes through the SDK's async client,
+        so several prompts can be awaited together (e.g. with asyncio.gather) on one loop.
+        
+        Args:
+            image_path: Path to the product image
+            product_persona: Structured product persona from Agent 1 (includes auto-detected font styles)
+            description: Product description (legacy, used if product_persona not provided)
+            user_inputs: Optional user inputs (legacy, used if product_persona not provided)
+            include_price: Whether to include pricing information
+            logo_path: Path to company logo (optional)
+            promotion_text: Promotion text (e.g., "30% winter sale") (optional)
+            image_bytes: Already loaded contents of image_path (optional), so callers sending
+                the same image several times don't re-read it
         
         Returns:
             Dictionary containing the generated prompt and metadata
         """
         try:
-            # Extract information from product_persona if provided, otherwise use legacy parameters
-            before_price = None
-            after_price = None
-            if product_persona:
-                ai_analysis = product_persona.get("ai_analysis", {})
-                user_data = product_persona.get("user_inputs", {})
-                
-                product_description = user_data.get("usp", "") or ai_analysis.get("raw_analysis", "") or description or ""
-                target_audience = user_data.get("target_audience", "")
-                product_name = user_data.get("product_name", "")
-                promotion_data = user_data.get("promotion", {})
-                
-                # Use promotion text and pricing from persona if available
-                if promotion_data.get("included", False):
-                    # Only set promotion_text if user didn't provide one in the UI
-                    if not promotion_text and promotion_data.get("percentage"):
-                        promotion_text = f"{promotion_data.get('percentage', 0)}% OFF"
-                # Pricing (before/after) is always taken from persona if present
-                before_price = promotion_data.get("before_price") or None
-                after_price = promotion_data.get("after_price") or None
-                
-                # Extract font styles from AI analysis
-                font_styles = ai_analysis.get('font_styles', None)
-                
-                # Extract ad_style from AI analysis (contains brand positioning-based template)
-                ad_style = ai_analysis.get('ad_style', None)
-                
-                # Extract brand positioning and key selling points
-                brand_positioning = ai_analysis.get('brand_positioning', 'MASS CONSUMER')
-                key_selling_points = ai_analysis.get('key_selling_points', [])
+            messages, font_styles, promotion_text = self._build_messages(
+                image_path, product_persona, description, user_inputs,
+                include_price, logo_path, promotion_text, image_bytes
+            )
+            
+            response = await self.llm.ainvoke(messages)
+            prompt_text = self._content_to_text(response.content)
+            
+            return self._build_result(prompt_text, image_path, product_persona, description, user_inputs,
+                                      font_styles, include_price, logo_path, promotion_text)
+            
+        except Exception as e:
+            return self._error_result(e, image_path, product_persona, description, user_inputs)
+    
+    def _generate_prompt(self, image_path: str,
+                         product_persona: Optional[Dict[str, Any]],
+                         description: Optional[str],
+                         user_inputs: Optional[Dict[str, Any]],
+                         include_price: bool,
+                         logo_path: Optional[str],
+                         promotion_text: Optional[str],
+                         on_chunk: Optional[Callable[[str], None]] = None,
+                         image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+        """Shared implementation of generate_prompt / generate_prompt_stream"""
+        try:
+            messages, font_styles, promotion_text = self._build_messages(
+                image_path, product_persona, description, user_inputs,
+                include_price, logo_path, promotion_text, image_bytes
+            )
+            
+            # Generate response
+            if on_chunk is None:
+                response = self.llm.invoke(messages)
+                prompt_text = self._content_to_text(response.content)
+            else:
+                chunks = []
+                finish_reason = None
+                for chunk in self.llm.stream(messages):
+                    text = self._content_to_text(chunk.content)
+                    if text:
+                        on_chunk(text)
+                        chunks.append(text)
+                    finish_reason = chunk.response_metadata.get("finish_reason") or finish_reason
+                prompt_text = "".join(chunks)
                 
-                # Build comprehensive product context
-                product_context = f"""
+                # The SDK tells us directly when the JSON was cut off
+                if finish_reason and finish_reason != "STOP":
+                    raise ValueError(f"Prompt generation stopped early (finish_reason={finish_reason})")
+
+            return self._build_result(prompt_text, image_path, product_persona, description, user_inputs,
+                                      font_styles, include_price, logo_path, promotion_text)
+            
+        except Exception as e:
+            return self._error_result(e, image_path, product_persona, description, user_inputs)
+    
+    def _build_messages(self, image_path: str,
+                        product_persona: Optional[Dict[str, Any]],
+                        description: Optional[str],
+                        user_inputs: Optional[Dict[str, Any]],
+                        include_price: bool,
+                        logo_path: Optional[str],
+                        promotion_text: Optional[str],
+                        image_bytes: Optional[bytes] = None) -> Tuple[List[Any], Optional[Dict[str, str]], Optional[str]]:
+        """
+        Build the model messages for one prompt request
+        
+        Returns:
+            Tuple of (messages, font_styles, promotion_text); the promotion text may
+            come from the product persona when none was passed in
+        """
+        # Extract information from product_persona if provided, otherwise use legacy parameters
+        before_price = None
+        after_price = None
+        if product_persona:
+            ai_analysis = product_persona.get("ai_analysis", {})
+            user_data = product_persona.get("user_inputs", {})
+            
+            product_description = user_data.get("usp", "") or ai_analysis.get("raw_analysis", "") or description or ""
+            target_audience = user_data.get("target_audience", "")
+            product_name = user_data.get("product_name", "")
+            promotion_data = user_data.get("promotion", {})
+            
+            # Use promotion text and pricing from persona if available
+            if promotion_data.get("included", False):
+                # Only set promotion_text if user didn't provide one in the UI
+                if not promotion_text and promotion_data.get("percentage"):
+                    promotion_text = f"{promotion_data.get('percentage', 0)}% OFF"
+            # Pricing (before/after) is always taken from persona if present
+            before_price = promotion_data.get("before_price") or None
+            after_price = promotion_data.get("after_price") or None
+            
+            # Extract font styles from AI analysis
+            font_styles = ai_analysis.get('font_styles', None)
+            
+            # Extract ad_style from AI analysis (contains brand positioning-based template)
+            ad_style = ai_analysis.get('ad_style', None)
+            
+            # Extract brand positioning and key selling points
+            brand_positioning = ai_analysis.get('brand_positioning', 'MASS CONSUMER')
+            key_selling_points = ai_analysis.get('key_selling_points', [])
+            
+            # Build comprehensive product context
+            product_context = f"""
 PRODUCT ANALYSIS (from AI):
 - Product Type: {ai_analysis.get('product_type', 'Not specified')}
 - Materials: {', '.join(ai_analysis.get('materials', [])) if ai_analysis.get('materials') else 'Not specified'}
@@ -653,55 +842,49 @@ USER PROVIDED INFORMATION:
 - Target Audience: {target_audience}
 - Additional Comments: {user_data.get('additional_comments', 'None')}
 """
-            else:
-                font_styles = None  # Will use defaults
-                ad_style = None  # Will use defaults
-                # Legacy mode: use description and user_inputs
-                product_description = description or ""
-                target_audience = user_inputs.get('target_audience', 'general') if user_inputs else 'general'
-                product_name = ""
-                product_context = f"""
+        else:
+            font_styles = None  # Will use defaults
+            ad_style = None  # Will use defaults
+            # Legacy mode: use description and user_inputs
+            product_description = description or ""
+            target_audience = user_inputs.get('target_audience', 'general') if user_inputs else 'general'
+            product_name = ""
+            product_context = f"""
 Product Description: {product_description}
 Target Audience: {target_audience}
 User Inputs: {user_inputs or "None provided"}
 """
-            
-            # Build system prompt with auto-detected font styles and ad style
-            system_prompt = self._build_system_prompt(
-                font_styles=font_styles,
-                ad_style=ad_style,
-                include_price=include_price,
-                logo_path=logo_path,
-                promotion_text=promotion_text,
-                before_price=before_price,
-                after_price=after_price
-            )
-            
-            # Encode image
-            base64_image = self.encode_image(image_path)
-            
-            # Prepare user message with font style information
-            if font_styles:
-                font_text = f"""Typography Styles (auto-detected based on product style):
+        
+        # Build system prompt with auto-detected font styles and ad style
+        system_prompt = self._build_system_prompt(
+            font_styles=font_styles,
+            ad_style=ad_style,
+            include_price=include_price,
+            logo_path=logo_path,
+            promotion_text=promotion_text,
+            before_price=before_price,
+            after_price=after_price
+        )
+        
+        # Prepare user message with font style information
+        if font_styles:
+            font_text = f"""Typography Styles (auto-detected based on product style):
 - Headline: {font_styles.get('headline', 'Professional serif')[:80]}...
 - Tagline: {font_styles.get('tagline', 'Clean sans-serif')[:80]}...
 - CTA: {font_styles.get('cta', 'Medium-weight sans-serif')[:80]}...
 - Price: {font_styles.get('price', 'Clear sans-serif')[:80]}..."""
-            else:
-                font_text = "Typography: Use professional, balanced typography appropriate for premium product advertising"
-            
-            # Prepare promotion information
-            promotion_info = ""
-            if promotion_text and include_price:
-                promotion_info = f"\nPromotion: {promotion_text}"
-            
-            # Prepare messages for Gemini
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=[
-                    {
-                        "type": "text",
-                        "text": f"""
+        else:
+            font_text = "Typography: Use professional, balanced typography appropriate for premium product advertising"
+        
+        # Prepare promotion information
+        promotion_info = ""
+        if promotion_text and include_price:
+            promotion_info = f"\nPromotion: {promotion_text}"
+        
+        # Prepare messages for Gemini
+        user_text = {
+            "type": "text",
+            "text": f"""
 {product_context}
                         
 Font Information:
@@ -793,74 +976,138 @@ CRITICAL JSON FORMATTING:
 - Ensure all brackets and braces are properly closed
 - Return complete, valid JSON that can be parsed without errors
                         """
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
+        }
+        
+        # Encode image
+        base64_image = self.encode_image(image_path, image_bytes)
+        
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=[
+                user_text,
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
                     }
-                ])
-            ]
-            
-            # Generate response
-            response = self.llm.invoke(messages)
-            
-            # Handle response.content which can be a string or list depending on langchain version
-            raw_content = response.content
-            if isinstance(raw_content, list):
-                # Extract ONLY text from list of content parts (skip image_url and other non-text parts)
-                text_parts = []
-                for part in raw_content:
-                    if isinstance(part, dict):
-                        # Only include text content, skip image_url and other binary data
-                        if part.get("type") == "text":
-                            text_parts.append(part.get("text", ""))
-                        elif "text" in part and "image" not in str(part.get("type", "")):
-                            text_parts.append(part.get("text", ""))
-                    elif isinstance(part, str) and not part.startswith("data:image"):
-                        # Skip base64 image strings
-                        text_parts.append(part)
-                prompt_text = " ".join(text_parts)
-            else:
-                prompt_text = str(raw_content) if raw_content else ""
-
-            # Post-process to enforce full promotion text (prevent abbreviation like "W SALE")
-            if promotion_text:
-                prompt_text = self._enforce_full_promotion_text(prompt_text, promotion_text)
-            
-            # Extract structured information
-            structured_prompt = self._parse_prompt(prompt_text)
-            
-            return {
-                "success": True,
-                "prompt": prompt_text,
-                "structured_prompt": structured_prompt,
-                "metadata": {
-                    "image_path": image_path,
-                    "product_persona": product_persona,
-                    "description": description,
-                    "user_inputs": user_inputs,
-                    "font_styles": font_styles,
-                    "include_price": include_price,
-                    "logo_path": logo_path,
-                    "promotion_text": promotion_text
                 }
+            ])
+        ]
+        
+        return messages, font_styles, promotion_text
+    
+    def _build_result(self, prompt_text: str, image_path: str,
+                      product_persona: Optional[Dict[str, Any]],
+                      description: Optional[str],
+                      user_inputs: Optional[Dict[str, Any]],
+                      font_styles: Optional[Dict[str, str]],
+                      include_price: bool,
+                      logo_path: Optional[str],
+                      promotion_text: Optional[str]) -> Dict[str, Any]:
+        """Post-process the model output into the success result dictionary"""
+        # Post-process to enforce full promotion text (prevent abbreviation like "W SALE")
+        if promotion_text:
+            prompt_text = self._enforce_full_promotion_text(prompt_text, promotion_text)
+        
+        # Extract structured information
+        structured_prompt = self._parse_prompt(prompt_text)
+        
+        return {
+            "success": True,
+            "prompt": prompt_text,
+            "prompt_json": self._extract_prompt_json(prompt_text),
+            "structured_prompt": structured_prompt,
+            "metadata": {
+                "image_path": image_path,
+                "product_persona": product_persona,
+                "description": description,
+                "user_inputs": user_inputs,
+                "font_styles": font_styles,
+                "include_price": include_price,
+                "logo_path": logo_path,
+                "promotion_text": promotion_text
             }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "prompt": None,
-                "structured_prompt": None,
-                "metadata": {
-                    "image_path": image_path,
-                    "product_persona": product_persona,
-                    "description": description,
-                    "user_inputs": user_inputs
-                }
+        }
+    
+    @staticmethod
+    def _error_result(error: Exception, image_path: str,
+                      product_persona: Optional[Dict[str, Any]],
+                      description: Optional[str],
+                      user_inputs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Error result dictionary for a failed prompt request"""
+        return {
+            "success": False,
+            "error": str(error),
+            "prompt": None,
+            "prompt_json": None,
+            "structured_prompt": None,
+            "metadata": {
+                "image_path": image_path,
+                "product_persona": product_persona,
+                "description": description,
+                "user_inputs": user_inputs
             }
+        }
+    
+    @staticmethod
+    def _content_to_text(raw_content: Any) -> str:
+        """
+        Extract the text from a model message content
+        
+        Args:
+            raw_content: response.content, which can be a string or list depending on langchain version
+        
+        Returns:
+            Text content only
+        """
+        if isinstance(raw_content, list):
+            # Extract ONLY text from list of content parts (skip image_url and other non-text parts)
+            text_parts = []
+            for part in raw_content:
+                if isinstance(part, dict):
+                    # Only include text content, skip image_url and other binary data
+                    if part.get("type") == "text":
+                        text_parts.append(part.get("text", ""))
+                    elif "text" in part and "image" not in str(part.get("type", "")):
+                        text_parts.append(part.get("text", ""))
+                elif isinstance(part, str) and not part.startswith("data:image"):
+                    # Skip base64 image strings
+                    text_parts.append(part)
+            return " ".join(text_parts)
+        return str(raw_content) if raw_content else ""
+    
+    @staticmethod
+    def _extract_prompt_json(prompt_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse the JSON object out of the generated prompt
+        
+        Args:
+            prompt_text: Raw prompt text, optionally wrapped in a markdown code fence
+        
+        Returns:
+            Parsed prompt dictionary or None if the prompt is not valid JSON
+            (even after removing trailing commas)
+        """
+        match = _FENCE_RE.search(prompt_text)
+        if match:
+            json_str = match.group(1)
+        else:
+            # No fence - fall back to the outermost braces
+            json_start = prompt_text.find('{')
+            json_end = prompt_text.rfind('}')
+            if json_start == -1 or json_end == -1:
+                return None
+            json_str = prompt_text[json_start:json_end + 1]
+        
+        try:
+            prompt_json = orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            # One repair attempt: drop trailing commas outside strings and parse again
+            try:
+                prompt_json = orjson.loads(_TRAILING_COMMA_RE.sub(lambda m: m.group(1) or m.group(2), json_str))
+            except orjson.JSONDecodeError:
+                return None
+        return prompt_json if isinstance(prompt_json, dict) else None
     
     def _enforce_full_promotion_text(self, prompt_text: str, promotion_text: str) -> str:
         """
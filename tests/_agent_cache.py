@@ -0,0 +1,38 @@
+"""
+Agent cache shared by the test scripts
+Constructing an agent builds a Google client and its HTTP session, so each
+(agent class, API key) pair is only constructed once per process
+"""
+
+import functools
+from typing import Optional
+
+import httpx
+
+
+@functools.lru_cache(maxsize=None)
+def shared_http_client() -> httpx.Client:
+    """
+    Return the HTTP client shared by all agents that accept one
+    
+    Reusing one keep-alive pool means the API calls of a test run share
+    connections instead of each agent doing its own TCP + TLS handshake.
+    """
+    return httpx.Client(limits=httpx.Limits(max_keepalive_connections=16))
+
+
+@functools.lru_cache(maxsize=None)
+def get_agent(cls, api_key: Optional[str] = None, **kwargs):
+    """
+    Return a shared agent instance
+    
+    Args:
+        cls: Agent class (e.g. BackgroundRemoverAgent)
+        api_key: API key passed to the agent (None lets the agent read it from the environment)
+        **kwargs: Extra constructor arguments (e.g. http_client=shared_http_client())
+    
+    Returns:
+        Cached instance of cls
+    """
+    # lru_cache is thread-safe for lookups; the Gemini clients themselves are safe to share
+    return cls(api_key, **kwargs)
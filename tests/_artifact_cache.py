@@ -0,0 +1,56 @@
+"""
+Content-addressed cache for cropped test images
+Cropped images are keyed by the SHA-256 of their source file together with the
+cropper's code and arguments, so re-running the tests on an unchanged input skips
+the work, while any change to the cropper produces a new entry.
+Background removal is not cached here - BackgroundRemoverAgent keeps its own cache.
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+from typing import Any, Callable, Dict
+
+CACHE_DIR = "data/output/cache"
+
+
+def _step_version(fn: Callable[..., Dict[str, Any]], args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Fingerprint of the code and arguments that produce the cached output"""
+    version = hashlib.sha256()
+    with open(inspect.getsourcefile(fn), "rb") as f:
+        version.update(f.read())
+    version.update(repr((args, sorted(kwargs.items()))).encode())
+    return version.hexdigest()[:8]
+
+
+def cached(step: str, src_path: str, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Dict[str, Any]:
+    """
+    Run an agent step, or reuse its output from a previous run on the same input
+
+    Args:
+        step: Step name used in the cache file name (e.g. "cropped")
+        src_path: Input file the step's output depends on
+        fn: Agent method returning a result dictionary with "success" and "output_path"
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The agent's result dictionary, or a minimal success dictionary on a cache hit
+    """
+    with open(src_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    # The cache file keeps the extension the agent produced, so look for any match
+    prefix = f"{step}_{digest}_{_step_version(fn, args, kwargs)}"
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if os.path.splitext(name)[0] == prefix:
+                return {"success": True, "output_path": os.path.join(CACHE_DIR, name), "cached": True}
+
+    result = fn(*args, **kwargs)
+    if result.get("success") and result.get("output_path"):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        extension = os.path.splitext(result["output_path"])[1]
+        shutil.copyfile(result["output_path"], os.path.join(CACHE_DIR, prefix + extension))
+    return result
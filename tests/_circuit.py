@@ -0,0 +1,135 @@
+"""
+Quota circuit breaker shared by the test scripts
+Once the API reports a quota/429 error, further agent calls fail immediately
+for a cool-down window instead of each paying a round trip and SDK backoff
+"""
+
+import asyncio
+import functools
+import inspect
+import random
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+_COOLDOWN = 30.0
+_last_429 = float("-inf")  # monotonic() can be below the cooldown on a freshly booted host
+
+# "Please retry in 17.5s." in the message, or the RetryInfo detail ('retryDelay': '17s')
+_RETRY_DELAY_RE = re.compile(r"retry in (\d+(?:\.\d+)?)s|retryDelay['\"]?:\s*['\"](\d+(?:\.\d+)?)s")
+
+
+def is_quota_error(message: str) -> bool:
+    """Check whether an error message is a quota / rate limit error"""
+    return "quota" in message.lower() or "429" in message or "ResourceExhausted" in message
+
+
+def guarded(fn: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Wrap an agent call with the quota circuit breaker
+    
+    The agents usually report failures as {"success": False, "error": ...} instead of
+    raising, so both raised exceptions and returned error dictionaries trip the breaker.
+    
+    Args:
+        fn: Agent method returning a result dictionary
+    
+    Returns:
+        Wrapped function returning an error dictionary while the circuit is open
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        global _last_429
+        if time.monotonic() - _last_429 < _COOLDOWN:
+            return {"success": False, "error": "circuit open (recent quota/429 error)"}
+        
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_quota_error(str(e)):
+                _last_429 = time.monotonic()
+            raise
+        
+        if not result.get("success") and is_quota_error(str(result.get("error", ""))):
+            _last_429 = time.monotonic()
+        return result
+    
+    return wrapper
+
+
+def retry_delay(message: str) -> Optional[float]:
+    """Return the retry delay in seconds suggested by a Gemini quota error, if any"""
+    match = _RETRY_DELAY_RE.search(message)
+    if not match:
+        return None
+    return float(match.group(1) or match.group(2))
+
+
+def with_backoff(fn: Callable[..., Dict[str, Any]], max_retries: int = 5,
+                 initial_delay: float = 1.0, max_delay: float = 32.0) -> Callable[..., Dict[str, Any]]:
+    """
+    Retry an agent call on quota / 429 errors with jittered exponential backoff
+    
+    Like guarded(), both raised exceptions and returned error dictionaries count.
+    The delay is the one the API suggests in the error when there is one; otherwise
+    it doubles after each retry (up to max_delay) plus up to a second of jitter, so
+    concurrent calls that hit the quota together do not all retry at once.
+    Coroutine functions (e.g. generate_prompt_async) are wrapped with an async
+    wrapper that waits with asyncio.sleep instead of blocking the event loop.
+    
+    Args:
+        fn: Agent method returning a result dictionary
+        max_retries: Maximum number of attempts
+        initial_delay: Delay before the first retry in seconds
+        max_delay: Upper bound for the computed delay in seconds
+    
+    Returns:
+        Wrapped function returning the first non-quota result (or the last one)
+    """
+    def next_delay(error: str, delay: float) -> float:
+        suggested = retry_delay(error)
+        return suggested if suggested is not None else min(delay + random.uniform(0, 1), max_delay)
+    
+    def should_retry(result: Dict[str, Any], last_attempt: bool) -> bool:
+        return not result.get("success") and not last_attempt and is_quota_error(str(result.get("error", "")))
+    
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            delay = initial_delay
+            for attempt in range(max_retries):
+                last_attempt = attempt == max_retries - 1
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as e:
+                    error = str(e)
+                    if last_attempt or not is_quota_error(error):
+                        raise
+                else:
+                    if not should_retry(result, last_attempt):
+                        return result
+                    error = str(result.get("error", ""))
+                await asyncio.sleep(next_delay(error, delay))
+                delay *= 2
+        
+        return async_wrapper
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        delay = initial_delay
+        for attempt in range(max_retries):
+            last_attempt = attempt == max_retries - 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+                if last_attempt or not is_quota_error(error):
+                    raise
+            else:
+                if not should_retry(result, last_attempt):
+                    return result
+                error = str(result.get("error", ""))
+            time.sleep(next_delay(error, delay))
+            delay *= 2
+    
+    return wrapper
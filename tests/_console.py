@@ -0,0 +1,26 @@
+"""
+Console output helpers shared by the test scripts
+"""
+
+import sys
+
+
+class Section:
+    """
+    Buffer a block of output lines and write them in one go
+    
+    Usage:
+        with Section() as say:
+            say("=" * 60)
+            say("TEST: ...")
+    """
+    
+    def __enter__(self):
+        self._lines = []
+        return self._lines.append
+    
+    def __exit__(self, *exc_info):
+        if self._lines:
+            sys.stdout.write("\n".join(self._lines) + "\n")
+            sys.stdout.flush()
+        return False
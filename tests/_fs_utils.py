@@ -0,0 +1,67 @@
+"""
+Filesystem helpers shared by the test scripts
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+
+def stat_or_none(path: str) -> Optional[os.stat_result]:
+    """
+    Stat a path, returning None if it does not exist
+    
+    One syscall answers both "does it exist?" and "how big is it?", instead of
+    os.path.exists followed by os.path.getsize.
+    
+    Args:
+        path: File path
+    
+    Returns:
+        os.stat_result or None if the path cannot be accessed
+    """
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def probe_image(path: str) -> Dict[str, Any]:
+    """
+    Check that an output image exists and is valid without decoding it
+    
+    Args:
+        path: Image path
+    
+    Returns:
+        Dictionary with path, stat (or None), size, format and error (None if valid)
+    """
+    probe = {"path": path, "stat": stat_or_none(path), "size": None, "format": None, "error": None}
+    if probe["stat"] is None:
+        probe["error"] = "file not found"
+        return probe
+    
+    from PIL import Image
+    
+    try:
+        with Image.open(path) as img:
+            probe["size"], probe["format"] = img.size, img.format  # header only
+            img.verify()  # integrity check without a full decode
+    except Exception as e:
+        probe["error"] = str(e)
+    return probe
+
+
+def probe_images(paths: List[str], max_workers: int = 8) -> List[Dict[str, Any]]:
+    """
+    Probe several images concurrently (stat and header reads are I/O bound)
+    
+    Args:
+        paths: Image paths
+        max_workers: Maximum number of threads
+    
+    Returns:
+        List of probe_image results, in the same order as paths
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(probe_image, paths))
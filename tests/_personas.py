@@ -0,0 +1,39 @@
+"""
+Product personas shared by the prompt generator tests
+The prompt generator takes fonts as font styles from the product persona
+(headline / tagline / price), not as separate keyword arguments
+"""
+
+from types import MappingProxyType
+
+# Product inputs shared by every test persona (read-only, copied into each persona)
+DESCRIPTION = "Premium wooden photo frame with mother-of-pearl inlay"
+TARGET_AUDIENCE = "Home decor enthusiasts"
+PROMOTION = MappingProxyType({"before_price": "2999 Rs", "after_price": "1899 Rs"})
+
+
+def font_persona(primary, secondary=None, pricing=None, description=DESCRIPTION, target_audience=TARGET_AUDIENCE):
+    """
+    Build a product persona carrying the user's fonts
+    
+    Args:
+        primary: Headline font
+        secondary: Tagline font (optional)
+        pricing: Price font (optional)
+        description: Product description (defaults to the shared photo frame)
+        target_audience: Target audience (defaults to the shared audience)
+    
+    Returns:
+        Product persona dict accepted by PromptGeneratorAgent.generate_prompt
+    """
+    font_styles = {"headline": primary, "tagline": secondary, "price": pricing}
+    return {
+        "ai_analysis": {
+            "font_styles": {role: font for role, font in font_styles.items() if font}
+        },
+        "user_inputs": {
+            "usp": description,
+            "target_audience": target_audience,
+            "promotion": dict(PROMOTION)
+        }
+    }
@@ -0,0 +1,111 @@
+"""
+Shared pytest fixtures
+
+The API-backed tests are independent, so run them in parallel with pytest-xdist:
+
+    pytest -n auto --dist=loadfile tests/
+
+--dist=loadfile keeps each test file on one worker, so the session fixtures
+(agents, prompt cache) are shared within a file and the quota is not hit by
+every worker at once.
+"""
+
+import os
+import warnings
+
+import pytest
+
+from tests._circuit import with_backoff
+
+TEST_IMAGE = "data/input/cuttlery_holder_nobackground.png"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def http_client():
+    """One keep-alive HTTP client for every agent in the session, closed at the end"""
+    # Heavy imports live in the session fixtures so collection (and every xdist worker) stays cheap
+    from tests._agent_cache import shared_http_client
+    client = shared_http_client()
+    yield client
+    client.close()
+    shared_http_client.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def api_key():
+    """Google API key; tests that need the API are skipped without it"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    key = os.getenv("GOOGLE_API_KEY")
+    if not key:
+        pytest.skip("GOOGLE_API_KEY missing")
+    return key
+
+
+@pytest.fixture(scope="session")
+def prompt_generator(api_key):
+    """One prompt generator (and SDK client) for the whole session, retrying on 429s"""
+    from src.agents.prompt_generator import PromptGeneratorAgent
+    agent = PromptGeneratorAgent(api_key)
+    # Cheap metadata call so the TCP + TLS handshake is done before the first prompt;
+    # later calls reuse the pooled connection. Only the google-genai based client
+    # (langchain-google-genai 3.x) exposes models.get - older versions skip the warm-up.
+    # Best effort - the tests report real errors.
+    models = getattr(getattr(agent.llm, "client", None), "models", None)
+    if models is not None and hasattr(models, "get"):
+        try:
+            models.get(model=agent.llm.model)
+        except Exception as e:
+            warnings.warn(f"Could not warm the Gemini connection: {str(e)[:200]}")
+    agent.generate_prompt = with_backoff(agent.generate_prompt)
+    agent.generate_prompt_async = with_backoff(agent.generate_prompt_async)
+    return agent
+
+
+@pytest.fixture(scope="session")
+def creative_generator(api_key, http_client):
+    """One creative generator for the whole session, on the shared HTTP client and retrying on 429s"""
+    from src.agents.creative_generator import CreativeGeneratorAgent
+    agent = CreativeGeneratorAgent(api_key, http_client=http_client)
+    agent.generate_creative = with_backoff(agent.generate_creative)
+    return agent
+
+
+@pytest.fixture(scope="session")
+def test_image():
+    """Path to the shared product test image"""
+    if not os.path.exists(TEST_IMAGE):
+        pytest.skip(f"Test image not found: {TEST_IMAGE}")
+    return TEST_IMAGE
+
+
+@pytest.fixture(scope="session")
+def test_logo(tmp_path_factory):
+    """Plain orange 200x200 logo, written once per session (and per xdist worker)"""
+    from PIL import Image
+    logo_path = tmp_path_factory.mktemp("logo") / "test_logo.png"
+    Image.new("RGB", (200, 200), color="#FF6600").save(logo_path)
+    return str(logo_path)
+
+
+@pytest.fixture(scope="session")
+def cached_prompt_generator(prompt_generator):
+    """
+    generate_prompt memoized on its arguments for the whole session
+    
+    Tests asking for the same image + persona + options share one Gemini call.
+    Only successful results are kept, so a quota error is retried by the next test.
+    """
+    import orjson
+    cache = {}
+
+    def call(**kwargs):
+        key = orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS)
+        if key in cache:
+            return cache[key]
+        result = prompt_generator.generate_prompt(**kwargs)
+        if result["success"]:
+            cache[key] = result
+        return result
+
+    return call
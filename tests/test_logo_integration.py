@@ -3,219 +3,76 @@ Test script for logo integration
 Tests that logo upload and passing works correctly through the workflow
 """
 
+import itertools
 import os
+import re
 import sys
-import json
-from PIL import Image
-from dotenv import load_dotenv
+import pytest
 
 # Add project root to path
 project_root = os.path.join(os.path.dirname(__file__), '..')
 sys.path.insert(0, os.path.abspath(project_root))
 
-from src.agents.prompt_generator import PromptGeneratorAgent
-from src.agents.creative_generator import CreativeGeneratorAgent
+from tests._console import Section
+from tests._personas import font_persona
 
-load_dotenv()
+# Case-insensitive scan of the raw prompt, without a lowercased copy of it
+_LOGO_RE = re.compile(r"logo", re.IGNORECASE)
 
-def create_test_logo():
-    """Create a simple test logo image"""
-    logo_dir = "data/output/temp"
-    os.makedirs(logo_dir, exist_ok=True)
-    
-    # Create a simple colored square as test logo
-    logo = Image.new('RGB', (200, 200), color='#FF6600')  # Orange color
-    logo_path = os.path.join(logo_dir, "test_logo.png")
-    logo.save(logo_path)
-    return logo_path
+LOGO_CASES = [pytest.param(True, id="with_logo"), pytest.param(False, id="without_logo")]
 
-def test_logo_integration():
-    """Test that logo integration works correctly"""
-    print("=" * 60)
-    print("TEST: Logo Integration")
-    print("=" * 60)
-    
-    # Test image path
-    test_image = "data/input/cuttlery_holder_nobackground.png"
-    
-    if not os.path.exists(test_image):
-        print(f"❌ Test image not found: {test_image}")
-        print("Please ensure test image exists in data/input/")
-        return False
-    
-    # Create test logo
-    print("\n[Setup] Creating test logo...")
-    logo_path = create_test_logo()
-    if not os.path.exists(logo_path):
-        print(f"❌ Failed to create test logo")
-        return False
-    print(f"✅ Test logo created: {logo_path}")
-    
-    try:
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            print("❌ GOOGLE_API_KEY not found in environment")
-            return False
-        
-        # Test 1: Prompt generator with logo
-        print("\n[Test 1] Testing prompt generator with logo...")
-        prompt_generator = PromptGeneratorAgent(api_key)
-        
-        try:
-            result1 = prompt_generator.generate_prompt(
-            image_path=test_image,
-            description="Premium wooden photo frame with mother-of-pearl inlay",
-            user_inputs={"target_audience": "Home decor enthusiasts", "price": "2999 Rs before, 1899 Rs after"},
-                primary_font="Calgary",
-                include_price=True,
-                logo_path=logo_path
-            )
-        except Exception as e:
-            error_msg = str(e)
-            if "quota" in error_msg.lower() or "429" in error_msg or "ResourceExhausted" in error_msg:
-                print(f"⚠️ QUOTA/RATE LIMIT ERROR: {error_msg[:200]}")
-                print("\nThis is not a test failure - it's an API quota issue.")
-                print("Please wait for quota to reset or upgrade your API plan.")
-                return False
-            else:
-                raise
-        
-        if result1["success"]:
-            prompt_text = result1["prompt"]
-            # Check if logo is mentioned in prompt
-            try:
-                # Clean JSON if wrapped in markdown
-                clean_prompt = prompt_text
-                if clean_prompt.startswith('```json'):
-                    clean_prompt = clean_prompt[7:]
-                if clean_prompt.endswith('```'):
-                    clean_prompt = clean_prompt[:-3]
-                clean_prompt = clean_prompt.strip()
-                
-                prompt_json = json.loads(clean_prompt)
-                branding = prompt_json.get("branding", {})
-                logo_config = branding.get("logo", {})
-                logo_enabled = logo_config.get("enabled")
-                
-                if logo_enabled == "true" or logo_enabled is True:
-                    print("✅ Test 1 PASSED: Logo is included in prompt")
-                    print(f"   ✓ Logo enabled: {logo_enabled}")
-                    print(f"   ✓ Logo placement configured")
-                else:
-                    print(f"❌ Test 1 FAILED: Logo not properly configured (enabled: {logo_enabled})")
-                    return False
-            except json.JSONDecodeError:
-                # Check if logo-related text is in prompt
-                if "logo" in prompt_text.lower():
-                    print("✅ Test 1 PASSED: Logo mentioned in prompt")
-                else:
-                    print("❌ Test 1 FAILED: Logo not mentioned in prompt")
-                    return False
-        else:
-            print(f"❌ Test 1 FAILED: {result1.get('error', 'Unknown error')}")
-            return False
-        
-        # Test 2: Prompt generator without logo
-        print("\n[Test 2] Testing prompt generator WITHOUT logo...")
-        result2 = prompt_generator.generate_prompt(
-            image_path=test_image,
-            description="Premium wooden photo frame with mother-of-pearl inlay",
-            user_inputs={"target_audience": "Home decor enthusiasts", "price": "2999 Rs before, 1899 Rs after"},
-            primary_font="Calgary",
-            include_price=True,
-            logo_path=None
-        )
-        
-        if result2["success"]:
-            prompt_text = result2["prompt"]
-            try:
-                clean_prompt = prompt_text
-                if clean_prompt.startswith('```json'):
-                    clean_prompt = clean_prompt[7:]
-                if clean_prompt.endswith('```'):
-                    clean_prompt = clean_prompt[:-3]
-                clean_prompt = clean_prompt.strip()
-                
-                prompt_json = json.loads(clean_prompt)
-                branding = prompt_json.get("branding", {})
-                logo_config = branding.get("logo", {})
-                logo_enabled = logo_config.get("enabled")
-                
-                if logo_enabled == "false" or logo_enabled is False:
-                    print("✅ Test 2 PASSED: Logo is excluded from prompt")
-                else:
-                    print(f"⚠️ Test 2: Logo enabled status: {logo_enabled} (may vary)")
-            except json.JSONDecodeError:
-                # Check if logo-related text is minimal in prompt
-                if "logo" in prompt_text.lower():
-                    logo_mentions = prompt_text.lower().count("logo")
-                    if logo_mentions < 3:  # Should have minimal logo mentions when disabled
-                        print("✅ Test 2 PASSED: Minimal logo mentions in prompt")
-                    else:
-                        print(f"⚠️ Test 2: Logo mentioned {logo_mentions} times (may vary)")
-                else:
-                    print("✅ Test 2 PASSED: Logo not mentioned in prompt")
-        else:
-            print(f"❌ Test 2 FAILED: {result2.get('error', 'Unknown error')}")
-            return False
-        
-        # Test 3: Creative generator with logo
-        print("\n[Test 3] Testing creative generator with logo...")
-        creative_generator = CreativeGeneratorAgent(api_key)
-        
-        # Use the prompt from test 1
-        creative_result = creative_generator.generate_creative(
-            image_path=test_image,
-            prompt=result1["prompt"],
-            product_description="Premium wooden photo frame",
-            logo_path=logo_path,
-            font_names=["Calgary"]  # Font used in test
-        )
-        
-        if creative_result["success"]:
-            print("✅ Test 3 PASSED: Creative generator accepts logo parameter")
-            print(f"   ✓ Output path: {creative_result.get('output_path', 'N/A')}")
-        else:
-            print(f"⚠️ Test 3: Creative generation may have failed, but logo parameter was accepted")
-            print(f"   Error: {creative_result.get('error', 'Unknown')}")
-            # Don't fail here as creative generation might fail for other reasons
-        
-        # Test 4: Creative generator without logo
-        print("\n[Test 4] Testing creative generator WITHOUT logo...")
-        creative_result2 = creative_generator.generate_creative(
-            image_path=test_image,
-            prompt=result2["prompt"],
-            product_description="Premium wooden photo frame",
-            logo_path=None,
-            font_names=["Calgary"]  # Font used in test
-        )
-        
-        if creative_result2["success"]:
-            print("✅ Test 4 PASSED: Creative generator works without logo")
-        else:
-            print(f"⚠️ Test 4: Creative generation may have failed")
-            print(f"   Error: {creative_result2.get('error', 'Unknown')}")
-        
-        print("\n" + "=" * 60)
-        print("✅ ALL LOGO INTEGRATION TESTS PASSED")
-        print("=" * 60)
-        return True
-        
-    except Exception as e:
-        print(f"\n❌ TEST FAILED WITH EXCEPTION: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
-    finally:
-        # Cleanup test logo
-        if os.path.exists(logo_path):
-            try:
-                os.remove(logo_path)
-                print(f"\n🧹 Cleaned up test logo: {logo_path}")
-            except:
-                pass
+def generate_logo_prompt(cached_prompt_generator, test_image, logo_path):
+    """Generate (or reuse) the prompt for one side of the logo axis"""
+    return cached_prompt_generator(
+        image_path=test_image,
+        product_persona=font_persona("Calgary"),
+        include_price=True,
+        logo_path=logo_path
+    )
 
-if __name__ == "__main__":
-    success = test_logo_integration()
-    sys.exit(0 if success else 1)
+def count_up_to(text, pattern, cap):
+    """Count matches of a compiled pattern in text, stopping once cap is reached"""
+    return sum(1 for _ in itertools.islice(pattern.finditer(text), cap))
 
+@pytest.mark.parametrize("logo_enabled", LOGO_CASES)
+def test_prompt_generator_logo(cached_prompt_generator, test_image, test_logo, logo_enabled):
+    """Test that the prompt enables the logo exactly when one is passed"""
+    result = generate_logo_prompt(cached_prompt_generator, test_image, test_logo if logo_enabled else None)
+    assert result["success"], result.get("error", "Unknown error")
+
+    with Section() as say:
+        prompt_json = result["prompt_json"]
+        if prompt_json is None:
+            # Not valid JSON - fall back to logo mentions in the raw prompt
+            if logo_enabled:
+                assert count_up_to(result["prompt"], _LOGO_RE, 1), "Logo not mentioned in prompt"
+            elif count_up_to(result["prompt"], _LOGO_RE, 3) == 3:  # Should have minimal logo mentions when disabled
+                say("⚠️ Logo mentioned 3+ times without a logo (may vary)")
+            return
+
+        enabled = prompt_json.get("branding", {}).get("logo", {}).get("enabled")
+        if logo_enabled:
+            assert enabled in (True, "true"), f"Logo not properly configured (enabled: {enabled})"
+        elif enabled not in (False, "false"):
+            say(f"⚠️ Logo enabled status without a logo: {enabled} (may vary)")
+
+@pytest.mark.parametrize("logo_enabled", LOGO_CASES)
+def test_creative_generator_logo(cached_prompt_generator, creative_generator, test_image, test_logo, logo_enabled):
+    """Test that the creative generator accepts the logo parameter (and works without it)"""
+    logo_path = test_logo if logo_enabled else None
+    prompt_result = generate_logo_prompt(cached_prompt_generator, test_image, logo_path)
+    assert prompt_result["success"], prompt_result.get("error", "Unknown error")
+
+    creative_result = creative_generator.generate_creative(
+        image_path=test_image,
+        prompt=prompt_result["prompt"],
+        product_description="Premium wooden photo frame",
+        logo_path=logo_path,
+        font_names=["Calgary"]  # Font used in test
+    )
+
+    # Don't fail on the generation itself - it can fail for reasons unrelated to the logo
+    if not creative_result["success"]:
+        with Section() as say:
+            say("⚠️ Creative generation may have failed, but the logo parameter was accepted")
+            say(f"   Error: {creative_result.get('error', 'Unknown')}")